@@ -0,0 +1,682 @@
+import os
+import re
+import json
+import asyncio
+import functools
+import asyncpg
+from urllib.parse import quote
+from dataclasses import dataclass, replace
+from dotenv import load_dotenv
+from supabase import create_client, Client, ClientOptions
+from playwright.async_api import async_playwright, TimeoutError
+
+# --- Variables de entorno ---
+ENV_KEYS = (
+    # Supabase. SUPABASE_DB_URL (opcional) es la conexión directa a Postgres:
+    # si existe, los precios se cargan con COPY.
+    "SUPABASE_URL", "SUPABASE_SERVICE_KEY", "SUPABASE_DB_URL",
+    # Proxy: obtén estas credenciales de tu proveedor y añádelas a los Secrets de GitHub
+    "PROXY_SERVER", "PROXY_PORT", "PROXY_USER", "PROXY_PASS",
+    # Si hay un servidor de Playwright corriendo (`playwright run-server`), nos
+    # conectamos a él en vez de lanzar un navegador nuevo en cada ejecución.
+    "PLAYWRIGHT_WS_ENDPOINT",
+    # Estrategia de scraping (ver config_from_env)
+    "SCRAPER_TARGET_URLS", "SCRAPER_BROWSER", "SCRAPER_WAIT_UNTIL", "SCRAPER_USE_PROXY",
+    "SCRAPER_SCROLL", "SCRAPER_CONCURRENCY", "USE_BROWSER_FALLBACK",
+)
+
+@functools.cache
+def _env():
+    """
+    Lee la configuración del entorno una sola vez por proceso. load_dotenv()
+    nunca pisa variables ya definidas, así que lo exportado en la shell o en
+    CI tiene prioridad y el .env completa el resto.
+    """
+    load_dotenv()
+    return {key: os.getenv(key) for key in ENV_KEYS}
+
+SUPABASE_TIMEOUT = 10  # Segundos por request a PostgREST / Storage
+
+VIEWPORT = {"width": 1920, "height": 1080}
+
+# Flags de arranque para Chromium headless: sin extensiones, GPU, sync ni
+# procesos en segundo plano, que solo suman tiempo de arranque y memoria.
+CHROMIUM_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--no-first-run",
+    "--blink-settings=imagesEnabled=false",
+]
+
+# Cookies y localStorage de la última ejecución exitosa, por supermercado.
+STORAGE_STATE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Todo lo que no sea dígito en un precio ("$1.990" -> "1990")
+_DIGITS_RE = re.compile(r"\D+")
+
+@dataclass
+class ScrapeConfig:
+    """
+    Todo lo que distingue a un supermercado de otro: dónde está el catálogo,
+    cómo se ven sus tarjetas y con qué estrategia de navegador se visita.
+    """
+    slug: str
+    target_urls: tuple[str, ...]  # Páginas de categoría a recorrer
+    card_selector: str
+    name_selector: str
+    price_selector: str
+    user_agent: str
+    browser: str = "chromium"  # "chromium" o "firefox"
+    wait_until: str = "commit"  # Basta con recibir la respuesta; luego esperamos las tarjetas
+    use_proxy: bool = False
+    scroll: bool = False  # Hacer scroll para cargar productos diferidos
+    name_attribute: str | None = None  # Leer el nombre de un atributo en vez del texto
+    browser_fallback: bool = True  # Usar el navegador si el camino rápido no entrega productos
+    max_concurrency: int = 3  # Pestañas abiertas al mismo tiempo
+    screenshot_path: str = "debug_screenshot.png"
+
+def config_from_env(config):
+    """
+    Permite cambiar la estrategia de navegador sin tocar el código, usando
+    SCRAPER_BROWSER, SCRAPER_WAIT_UNTIL, SCRAPER_USE_PROXY, SCRAPER_SCROLL,
+    SCRAPER_CONCURRENCY y USE_BROWSER_FALLBACK. SCRAPER_TARGET_URLS
+    reemplaza las categorías por una lista separada por comas.
+    """
+    env = _env()
+
+    def env_flag(name, default):
+        value = env[name]
+        return default if value is None else value.lower() not in ("0", "false", "no")
+
+    target_urls = env["SCRAPER_TARGET_URLS"]
+
+    return replace(
+        config,
+        target_urls=tuple(url.strip() for url in target_urls.split(",") if url.strip()) if target_urls else config.target_urls,
+        browser=env["SCRAPER_BROWSER"] or config.browser,
+        wait_until=env["SCRAPER_WAIT_UNTIL"] or config.wait_until,
+        use_proxy=env_flag("SCRAPER_USE_PROXY", config.use_proxy),
+        scroll=env_flag("SCRAPER_SCROLL", config.scroll),
+        browser_fallback=env_flag("USE_BROWSER_FALLBACK", config.browser_fallback),
+        max_concurrency=int(env["SCRAPER_CONCURRENCY"] or config.max_concurrency),
+    )
+
+def get_proxy_settings():
+    """
+    Devuelve la configuración de proxy para Playwright, o None si faltan credenciales.
+    """
+    env = _env()
+    if env["PROXY_SERVER"] and env["PROXY_PORT"] and env["PROXY_USER"] and env["PROXY_PASS"]:
+        return {
+            "server": f"http://{env['PROXY_SERVER']}:{env['PROXY_PORT']}",
+            "username": env["PROXY_USER"],
+            "password": env["PROXY_PASS"]
+        }
+    return None
+
+def get_proxy_url():
+    """
+    Igual que get_proxy_settings(), pero como URL para httpx. Usuario y clave
+    van escapados para que caracteres como @, :, / o # no rompan la URL.
+    """
+    if get_proxy_settings():
+        env = _env()
+        user = quote(env["PROXY_USER"], safe="")
+        password = quote(env["PROXY_PASS"], safe="")
+        return f"http://{user}:{password}@{env['PROXY_SERVER']}:{env['PROXY_PORT']}"
+    return None
+
+# --- Extracción en el navegador ---
+# Recibe todas las tarjetas del locator y devuelve una lista de {name, price}
+# en un solo viaje. Los selectores "tag.clase" se resuelven una vez y se buscan
+# con getElementsByClassName en cada tarjeta, sin volver a parsear CSS; se usa
+# textContent en vez de innerText para no forzar un cálculo de layout.
+EXTRACT_PRODUCTS_JS = r"""
+(els, sel) => {
+    const finder = (selector) => {
+        const m = /^([a-z][a-z0-9]*)?\.([\w-]+)$/i.exec(selector);
+        if (!m) return el => el.querySelector(selector);
+        const tag = m[1] ? m[1].toUpperCase() : null;
+        const cls = m[2];
+        return el => {
+            const found = el.getElementsByClassName(cls);
+            for (let i = 0; i < found.length; i++) {
+                if (!tag || found[i].tagName === tag) return found[i];
+            }
+            return null;
+        };
+    };
+    const findName = finder(sel.name);
+    const findPrice = finder(sel.price);
+    const out = [];
+    for (let i = 0; i < els.length; i++) {
+        const n = findName(els[i]);
+        const p = findPrice(els[i]);
+        if (!n || !p) continue;
+        const name = sel.nameAttr ? (n.getAttribute(sel.nameAttr) || '').trim() : n.textContent.replace(/\s+/g, ' ').trim();
+        if (!name) continue;  // Sin nombre (p. ej. enlace sin 'title') no sirve el precio
+        out.push({name, price: p.textContent.replace(/\D+/g, '')});
+    }
+    return out;
+}
+"""
+
+# --- Esperas ---
+NAVIGATION_TIMEOUT_MS = 30000
+MAX_SCROLL_ROUNDS = 10  # Tope de scrolls para grillas con carga diferida
+SCROLL_GROWTH_TIMEOUT_MS = 2000  # Si no aparecen tarjetas nuevas en este tiempo, paramos
+CARD_COUNT_GREW_JS = "([sel, count]) => document.querySelectorAll(sel).length > count"
+
+# --- Bloqueo de recursos innecesarios ---
+# Solo necesitamos el HTML y los scripts que pintan las tarjetas.
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+BLOCKED_HOSTS = ("googletagmanager", "google-analytics", "doubleclick", "hotjar", "facebook")
+
+async def block_unneeded_requests(route):
+    """
+    Aborta imágenes, fuentes, estilos y trackers para acelerar la carga.
+    """
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+@functools.cache
+def get_supabase():
+    """
+    Cliente único de Supabase para todo el proceso: la búsqueda del ID y todas
+    las inserciones reutilizan la misma sesión HTTP (y su conexión TLS).
+    """
+    options = ClientOptions(
+        postgrest_client_timeout=SUPABASE_TIMEOUT,
+        storage_client_timeout=SUPABASE_TIMEOUT,
+    )
+    supabase: Client = create_client(_env()["SUPABASE_URL"], _env()["SUPABASE_SERVICE_KEY"], options=options)
+    return supabase
+
+def prepare_supabase(slug):
+    """
+    Crea el cliente y resuelve el ID del supermercado. Pensado para correr en
+    un hilo mientras el navegador trabaja.
+    """
+    supabase = get_supabase()
+    cached = slug in load_supermarket_cache()
+    supermarket_id = get_supermarket_id(supabase, slug)
+    if cached:
+        # Con el ID en caché no hubo ningún request: mandamos uno vacío para que
+        # la conexión (TCP + TLS) quede abierta antes de la primera inserción.
+        try:
+            supabase.table("supermarkets").select("id").limit(0).execute()
+        except Exception as e:
+            print(f"⚠️ No se pudo precalentar la conexión a Supabase: {e}")
+    return supermarket_id
+
+# --- Caché local del ID de supermercado ---
+# El slug -> id no cambia, así que lo guardamos para no consultarlo en cada ejecución.
+SUPERMARKET_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".supermarket_ids.json")
+
+def load_supermarket_cache():
+    """
+    Lee el caché slug -> id, o devuelve un dict vacío si no existe o está corrupto.
+    """
+    try:
+        with open(SUPERMARKET_CACHE_PATH, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def get_supermarket_id(supabase, slug):
+    """
+    Devuelve el ID del supermercado, leyéndolo del caché local si existe y
+    consultándolo a Supabase solo la primera vez.
+    """
+    cache = load_supermarket_cache()
+
+    if slug in cache:
+        return cache[slug]
+
+    response = supabase.table("supermarkets").select("id").eq("slug", slug).execute()
+    supermarket_id = response.data[0]['id']
+
+    cache[slug] = supermarket_id
+    try:
+        with open(SUPERMARKET_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el caché de supermercados: {e}")
+    return supermarket_id
+
+# --- Inserción por lotes ---
+INSERT_CHUNK_SIZE = 1000  # Filas por request a PostgREST
+INSERT_CONCURRENCY = 4  # Requests de inserción simultáneos
+
+async def insert_prices(supabase, products):
+    """
+    Inserta un lote de precios (a lo sumo INSERT_CHUNK_SIZE, ver publish_rows)
+    en un solo request. La concurrencia la limita insert_worker. Devuelve
+    cuántos registros se insertaron.
+    """
+    try:
+        response = await asyncio.to_thread(supabase.table("prices").insert(products).execute)
+    except Exception as e:
+        print(f"❌ Error crítico al insertar en Supabase: {e}")
+        return 0
+    if not response.data:
+        print(f"❌ Error en la inserción: {getattr(response, 'error', 'Error desconocido')}")
+        return 0
+    return len(response.data)
+
+def get_storage_state_path(slug):
+    """
+    Ruta del storage_state guardado para un supermercado.
+    """
+    return os.path.join(STORAGE_STATE_DIR, f".state_{slug}.json")
+
+def load_storage_state(slug):
+    """
+    Lee el storage_state guardado. Si el archivo está corrupto o truncado lo
+    borra y devuelve None, para que la ejecución parta sin estado.
+    """
+    path = get_storage_state_path(slug)
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        state = None
+        print(f"⚠️ storage_state inválido ({e}), se descarta.")
+
+    if isinstance(state, dict):
+        return state
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return None
+
+def save_storage_state(slug, state):
+    """
+    Guarda el storage_state de forma atómica, para no dejar un archivo a medias.
+    """
+    path = get_storage_state_path(slug)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el storage_state: {e}")
+
+# --- Carga directa con COPY ---
+PRICE_COLUMNS = ["supermarket_id", "price", "regular_price", "is_available", "source", "metadata"]
+
+async def create_db_pool():
+    """
+    Abre un pool de conexiones directas a Postgres (SUPABASE_DB_URL), una por
+    cada inserción simultánea permitida.
+    """
+    # statement_cache_size=0 es obligatorio detrás del pooler de Supabase (modo transacción).
+    return await asyncpg.create_pool(
+        dsn=_env()["SUPABASE_DB_URL"], ssl="require", statement_cache_size=0,
+        min_size=1, max_size=INSERT_CONCURRENCY,
+    )
+
+async def copy_prices(conn, records):
+    """
+    Carga las tuplas de build_records() con COPY binario, sin pasar por
+    PostgREST. Devuelve cuántos registros se cargaron.
+    """
+    await conn.copy_records_to_table("prices", records=records, columns=PRICE_COLUMNS)
+    return len(records)
+
+async def save_prices(prices, supermarket_id, pool=None):
+    """
+    Guarda los pares (nombre, precio) por COPY si hay pool de conexiones
+    directas, y si no (o si falla) por lotes vía PostgREST. Devuelve cuántos
+    registros se guardaron.
+    """
+    if pool is not None:
+        try:
+            async with pool.acquire() as conn:
+                return await copy_prices(conn, build_records(prices, supermarket_id))
+        except Exception as e:
+            # COPY es atómico: si falló no quedó nada cargado y podemos reintentar por REST.
+            print(f"⚠️ Error en la carga directa a Postgres: {e}. Usando PostgREST.")
+    return await insert_prices(get_supabase(), build_products(prices, supermarket_id))
+
+# --- Inserción en paralelo con el scraping ---
+# Los lotes que pasan del scraper al insertador son de INSERT_CHUNK_SIZE filas,
+# y se guardan hasta INSERT_CONCURRENCY lotes a la vez.
+STREAM_QUEUE_SIZE = 4  # Lotes en espera antes de frenar al scraper
+
+async def put_or_fail(queue, item, insert_task):
+    """
+    Encola `item` sin quedar bloqueado para siempre si el insertador murió:
+    la espera compite contra `insert_task` y, si este termina primero, se
+    propaga su error.
+    """
+    put = asyncio.ensure_future(queue.put(item))
+    try:
+        done, _ = await asyncio.wait({put, insert_task}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if not put.done():
+            put.cancel()
+    if put not in done:
+        insert_task.result()  # Propaga la excepción del insertador, si la hubo
+        raise RuntimeError("El insertador terminó antes de recibir todos los lotes.")
+
+async def publish_rows(queue, rows, insert_task):
+    """
+    Entrega las filas extraídas al insertador en lotes de INSERT_CHUNK_SIZE.
+    """
+    for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+        await put_or_fail(queue, rows[i:i + INSERT_CHUNK_SIZE], insert_task)
+
+async def insert_worker(queue, supermarket_task):
+    """
+    Guarda los lotes a medida que llegan por la cola, hasta INSERT_CONCURRENCY
+    a la vez, mientras el scraping sigue en curso, hasta recibir None.
+    Devuelve cuántos registros se guardaron.
+    """
+    try:
+        supermarket_id = await supermarket_task
+        print(f"✅ Conexión a Supabase y ID de supermercado ('{supermarket_id}') obtenidos.")
+    except Exception as e:
+        print(f"❌ Error conectando a Supabase o obteniendo ID: {e}")
+        supermarket_id = None
+
+    pool = None
+    if supermarket_id is not None and _env()["SUPABASE_DB_URL"]:
+        try:
+            pool = await create_db_pool()
+        except Exception as e:
+            print(f"⚠️ Error conectando directo a Postgres: {e}. Usando PostgREST.")
+
+    totals = {"found": 0, "valid": 0, "inserted": 0}
+    semaphore = asyncio.Semaphore(INSERT_CONCURRENCY)
+    tasks = set()
+
+    async def save_batch(rows):
+        # Un lote con error no detiene al insertador: la cola se sigue vaciando.
+        try:
+            prices = parse_prices(rows)
+            if prices:
+                totals["valid"] += len(prices)
+                print(f"📥 Insertando {len(prices)} productos en la base de datos...")
+                # Se espera antes de sumar: `+= await` leería el total de antes de la espera.
+                inserted = await save_prices(prices, supermarket_id, pool)
+                totals["inserted"] += inserted
+        except Exception as e:
+            print(f"❌ Error guardando un lote de {len(rows)} productos: {e}. Continuando.")
+        finally:
+            semaphore.release()
+
+    try:
+        while True:
+            # El cupo se toma antes de sacar de la cola, así la cola sigue frenando al scraper.
+            await semaphore.acquire()
+            rows = await queue.get()
+            if rows is None:
+                break
+            totals["found"] += len(rows)
+            # Sin ID no podemos guardar, pero seguimos vaciando la cola para no bloquear al scraper.
+            if supermarket_id is None:
+                semaphore.release()
+                continue
+            task = asyncio.create_task(save_batch(rows))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if pool is not None:
+            await pool.close()
+
+    print(f"🔎 Encontrados {totals['found']} productos en total.")
+    if supermarket_id is None:
+        return 0
+    if not totals["valid"]:
+        print("🤷 No se encontraron productos válidos para insertar.")
+    elif totals["inserted"] == totals["valid"]:
+        print(f"✅ ¡Éxito! {totals['inserted']} registros insertados.")
+    else:
+        print(f"⚠️ Inserción parcial: {totals['inserted']} de {totals['valid']} registros insertados.")
+    return totals["inserted"]
+
+async def scrape_one(browser, config, url, semaphore, screenshot_path, context_options, state_holder):
+    """
+    Extrae las tarjetas de una página de categoría en su propio contexto.
+    Devuelve None si la página no cargó. El primer contexto exitoso deja su
+    storage_state en `state_holder` para guardarlo al final de la ejecución.
+    """
+    async with semaphore:
+        context = None
+        page = None
+        print(f" navegando a: {url}")
+        try:
+            # Si falla la creación del contexto, solo se pierde esta categoría.
+            context = await browser.new_context(
+                user_agent=config.user_agent,
+                viewport=VIEWPORT,
+                **context_options
+            )
+            await context.route("**/*", block_unneeded_requests)
+            page = await context.new_page()
+
+            await page.goto(url, wait_until=config.wait_until, timeout=NAVIGATION_TIMEOUT_MS)
+            print(f"✅ Página cargada correctamente: {url}")
+
+            # Seguimos apenas aparece la primera tarjeta, sin esperas fijas.
+            cards = page.locator(config.card_selector)
+            await cards.first.wait_for(state="attached", timeout=NAVIGATION_TIMEOUT_MS)
+            print(f"📦 Productos encontrados en la página: {url}")
+            # Con "commit" el parser puede seguir recibiendo el resto de la grilla;
+            # esperamos a que termine el HTML (barato, los subrecursos están bloqueados).
+            await page.wait_for_load_state("domcontentloaded", timeout=NAVIGATION_TIMEOUT_MS)
+
+            if config.scroll:
+                print("... simulando scroll para cargar productos...")
+                for _ in range(MAX_SCROLL_ROUNDS):
+                    count = await cards.count()
+                    await page.mouse.wheel(0, 2000)
+                    try:
+                        await page.wait_for_function(CARD_COUNT_GREW_JS, arg=[config.card_selector, count], timeout=SCROLL_GROWTH_TIMEOUT_MS)
+                    except TimeoutError:
+                        break
+
+            # Extraemos todas las tarjetas en una sola llamada al navegador, en vez de
+            # hacer varias consultas por cada producto.
+            rows = await cards.evaluate_all(EXTRACT_PRODUCTS_JS, {
+                "name": config.name_selector,
+                "price": config.price_selector,
+                "nameAttr": config.name_attribute,
+            })
+
+            # Cookies/localStorage para que la próxima ejecución parta "en caliente".
+            # Es solo un caché: si falla, las filas ya extraídas se devuelven igual.
+            if "state" not in state_holder:
+                state_holder["state"] = None
+                try:
+                    state_holder["state"] = await context.storage_state()
+                except Exception as e:
+                    print(f"⚠️ No se pudo leer el storage_state: {e}")
+                    del state_holder["state"]  # Que lo intente la próxima categoría
+            return rows
+
+        except TimeoutError:
+            print(f"❌ Error: Timeout esperando que la página o los productos cargaran: {url}")
+            if page is not None:
+                try:
+                    await page.screenshot(path=screenshot_path, full_page=True)
+                    print(f"📸 Screenshot '{screenshot_path}' guardado para depuración.")
+                except Exception as e:
+                    print(f"⚠️ No se pudo guardar el screenshot '{screenshot_path}': {e}")
+            return None
+        except Exception as e:
+            print(f"❌ Error al navegar a la página {url}: {e}")
+            return None
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    print(f"⚠️ Error cerrando el contexto de {url}: {e}")
+
+async def fetch_via_browser(config, urls, publish):
+    """
+    Abre un único navegador y recorre las categorías en paralelo, con a lo sumo
+    `max_concurrency` pestañas a la vez. Cada categoría entrega sus filas a la
+    corrutina `publish` apenas termina, para que el insertador las guarde
+    mientras el resto sigue cargando.
+    """
+    proxy_settings = None
+    if config.use_proxy:
+        proxy_settings = get_proxy_settings()
+        if proxy_settings:
+            print("... usando configuración de proxy.")
+
+    context_options = {}
+    storage_state = load_storage_state(config.slug)
+    if storage_state:
+        context_options["storage_state"] = storage_state
+    state_holder = {}
+
+    async with async_playwright() as p:
+        browser_type = getattr(p, config.browser)
+        ws_endpoint = _env()["PLAYWRIGHT_WS_ENDPOINT"]
+        if ws_endpoint:
+            print(f"... conectando al navegador en {ws_endpoint}")
+            browser = await browser_type.connect(ws_endpoint)
+            # El navegador remoto ya está lanzado, así que el proxy va por contexto.
+            if proxy_settings:
+                context_options["proxy"] = proxy_settings
+        else:
+            browser = await browser_type.launch(
+                headless=True,
+                proxy=proxy_settings,
+                # Los flags son propios de Chromium; Firefox los rechaza.
+                args=CHROMIUM_ARGS if config.browser == "chromium" else None
+            )
+        semaphore = asyncio.Semaphore(config.max_concurrency)
+
+        # Con varias categorías, cada una deja su propio screenshot.
+        stem, ext = os.path.splitext(config.screenshot_path)
+        screenshot_paths = [config.screenshot_path] if len(urls) == 1 else [f"{stem}_{i}{ext}" for i in range(len(urls))]
+
+        async def scrape_and_publish(url, screenshot_path):
+            rows = await scrape_one(browser, config, url, semaphore, screenshot_path, context_options, state_holder)
+            if rows:
+                await publish(rows)
+
+        try:
+            # Un error en una categoría no debe cortar las demás.
+            results = await asyncio.gather(
+                *(scrape_and_publish(url, path) for url, path in zip(urls, screenshot_paths)),
+                return_exceptions=True,
+            )
+            for url, result in zip(urls, results):
+                if isinstance(result, Exception):
+                    print(f"❌ Error procesando la categoría {url}: {result}")
+            if state_holder.get("state"):
+                save_storage_state(config.slug, state_holder["state"])
+        finally:
+            # El insertador sigue trabajando mientras el navegador se cierra.
+            await browser.close()
+
+def parse_prices(rows):
+    """
+    Convierte las filas {name, price} extraídas en pares (nombre, precio),
+    descartando los nombres vacíos y los precios vacíos o en cero.
+    """
+    prices = []
+    for row in rows:
+        try:
+            name = row["name"].strip()
+            price = int(_DIGITS_RE.sub("", row["price"]) or "0")
+            if name and price > 0:
+                prices.append((name, price))
+        except Exception as e:
+            print(f"⚠️ Error extrayendo un producto: {e}. Continuando.")
+    return prices
+
+def build_products(prices, supermarket_id):
+    """
+    Arma los registros para insertar en la tabla prices vía PostgREST.
+    """
+    # Las claves constantes se arman una sola vez y se combinan por producto.
+    base = {"supermarket_id": supermarket_id, "is_available": True, "source": "scraping"}
+    return [
+        base | {"price": price, "regular_price": price, "metadata": {"scraped_name": name}}
+        for name, price in prices
+    ]
+
+def build_records(prices, supermarket_id):
+    """
+    Igual que build_products(), pero como tuplas en el orden de PRICE_COLUMNS para COPY.
+    """
+    return [
+        (supermarket_id, price, price, True, "scraping", json.dumps({"scraped_name": name}))
+        for name, price in prices
+    ]
+
+async def scrape(config, fast_path=None):
+    """
+    Orquesta el scraping de un supermercado: obtiene los productos de todas sus
+    categorías (primero por `fast_path`, si se entrega, y si no con el navegador)
+    y los va insertando en Supabase a medida que llegan.
+
+    `fast_path` recibe la configuración y devuelve un dict {url: filas}; las
+    categorías que vuelven vacías se recorren con el navegador.
+    """
+    print(f"🚀 Iniciando scraper para {config.slug.upper()}...")
+
+    # El cliente y el ID se preparan en segundo plano mientras se descargan los productos.
+    supermarket_task = asyncio.create_task(asyncio.to_thread(prepare_supabase, config.slug))
+
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    insert_task = asyncio.create_task(insert_worker(queue, supermarket_task))
+
+    async def publish(rows):
+        await publish_rows(queue, rows, insert_task)
+
+    async def finish_inserts():
+        await put_or_fail(queue, None, insert_task)
+        return await insert_task
+
+    try:
+        fast_rows = await fast_path(config) if fast_path else {}
+        for url in config.target_urls:
+            await publish(fast_rows.get(url, []))
+        pending_urls = [url for url in config.target_urls if not fast_rows.get(url)]
+
+        if pending_urls and config.browser_fallback:
+            await fetch_via_browser(config, pending_urls, publish)
+        elif pending_urls:
+            print("⚠️ El camino rápido no entregó productos para algunas categorías y el navegador está deshabilitado (USE_BROWSER_FALLBACK=false).")
+    except asyncio.CancelledError:
+        insert_task.cancel()
+        await asyncio.gather(insert_task, return_exceptions=True)
+        raise
+    except Exception:
+        # Lo que ya quedó en la cola se guarda igual antes de propagar el error.
+        if insert_task.done():
+            await asyncio.gather(insert_task, return_exceptions=True)
+        else:
+            try:
+                await finish_inserts()
+            except Exception as e:
+                print(f"❌ Error cerrando el insertador: {e}")
+        raise
+
+    return await finish_inserts()
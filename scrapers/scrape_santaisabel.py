@@ -1,136 +1,129 @@
-import os
 import asyncio
-from dotenv import load_dotenv
-from supabase import create_client, Client
-from playwright.async_api import async_playwright, TimeoutError
-
-# Cargar variables de entorno
-load_dotenv()
+import httpx
+from urllib.parse import urlsplit
+from selectolax.parser import HTMLParser
+from common import ScrapeConfig, config_from_env, get_proxy_url, scrape
 
 # --- Configuración ---
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-SUPERMARKET_SLUG = "santa-isabel"
-TARGET_URL = "https://www.santaisabel.cl/panaderia-y-pasteleria"
-
-# --- Selectores CSS (Confirmados) ---
-PRODUCT_CARD_SELECTOR = ".product-card-wrap"
-PRODUCT_NAME_SELECTOR = "p.product-card-name"
-PRODUCT_PRICE_SELECTOR = "span.prices-main-price"
+CONFIG = ScrapeConfig(
+    slug="santa-isabel",
+    target_urls=("https://www.santaisabel.cl/panaderia-y-pasteleria",),
+    # --- Selectores CSS (Confirmados) ---
+    card_selector=".product-card-wrap",
+    name_selector="p.product-card-name",
+    price_selector="span.prices-main-price",
+    # --- Parámetros Anti-Bloqueo Avanzados ---
+    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0",
+    browser="firefox",
+    use_proxy=True,
+    scroll=True,
+)
 
-# --- Parámetros Anti-Bloqueo Avanzados ---
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0"
-VIEWPORT = {"width": 1920, "height": 1080}
+# --- API del catálogo (VTEX) ---
+# Si responde, nos ahorramos levantar el navegador por completo.
+API_URL = "https://www.santaisabel.cl/api/catalog_system/pub/products/search/{category}"
+API_PAGE_SIZE = 50  # VTEX no entrega más de 50 productos por página
+API_MAX_ITEMS = 2500  # Límite de paginación de VTEX
 
-# --- CONFIGURACIÓN DE PROXY ---
-# Obtén estas credenciales de tu proveedor de proxy y añádelas a los Secrets de GitHub
-PROXY_SERVER = os.getenv("PROXY_SERVER") 
-PROXY_PORT = os.getenv("PROXY_PORT")     
-PROXY_USER = os.getenv("PROXY_USER")
-PROXY_PASS = os.getenv("PROXY_PASS")
+def parse_api_products(products):
+    """
+    Convierte la respuesta JSON de VTEX en filas {name, price}.
+    """
+    rows = []
+    for product in products:
+        try:
+            offer = product["items"][0]["sellers"][0]["commertialOffer"]
+            if offer.get("AvailableQuantity", 1) > 0:
+                rows.append({"name": product["productName"], "price": str(round(offer["Price"]))})
+        except (KeyError, IndexError, TypeError):
+            continue
+    return rows
 
-async def main():
+def parse_html_products(html, config):
     """
-    Función principal que orquesta el proceso de scraping con técnicas de evasión avanzadas.
+    Extrae las tarjetas de producto del HTML renderizado en el servidor,
+    leyendo el nombre igual que en el navegador (texto o `name_attribute`).
     """
-    print("🚀 Iniciando scraper para Santa Isabel (Modo Evasión Final)...")
+    rows = []
+    for card in HTMLParser(html).css(config.card_selector):
+        name_node = card.css_first(config.name_selector)
+        price_node = card.css_first(config.price_selector)
+        if not (name_node and price_node):
+            continue
+        if config.name_attribute:
+            name = (name_node.attributes.get(config.name_attribute) or "").strip()
+        else:
+            name = " ".join(name_node.text().split())
+        if name:
+            rows.append({"name": name, "price": price_node.text()})
+    return rows
 
-    proxy_settings = None
-    if PROXY_SERVER and PROXY_PORT and PROXY_USER and PROXY_PASS:
-        print("... usando configuración de proxy.")
-        proxy_settings = {
-            "server": f"http://{PROXY_SERVER}:{PROXY_PORT}",
-            "username": PROXY_USER,
-            "password": PROXY_PASS
-        }
+async def fetch_category(client, config, url):
+    """
+    Intenta obtener los productos de una categoría sin navegador: primero la
+    API de VTEX y, si no responde, el HTML de la página. Devuelve una lista
+    vacía si ninguno de los dos caminos entrega productos.
+    """
+    api_url = API_URL.format(category=urlsplit(url).path.strip("/"))
+    rows = []
+    try:
+        for start in range(0, API_MAX_ITEMS, API_PAGE_SIZE):
+            response = await client.get(api_url, params={"_from": start, "_to": start + API_PAGE_SIZE - 1})
+            # VTEX responde 206 cuando quedan más páginas
+            if response.status_code not in (200, 206):
+                break
+            products = response.json()
+            if not products:
+                break
+            rows.extend(parse_api_products(products))
+            if len(products) < API_PAGE_SIZE:
+                break
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"⚠️ Error consultando la API del catálogo ({url}): {e}")
 
-    async with async_playwright() as p:
-        browser = await p.firefox.launch(
-            headless=True,
-            proxy=proxy_settings # <-- ¡AQUÍ SE APLICA EL PROXY!
-        )
-        context = await browser.new_context(
-            user_agent=USER_AGENT,
-            viewport=VIEWPORT,
-            java_script_enabled=True,
-        )
-        page = await context.new_page()
-        
-        print(f" navegando a: {TARGET_URL}")
-        try:
-            await page.goto(TARGET_URL, wait_until="domcontentloaded", timeout=90000)
-            print("✅ Página cargada. Esperando a que se asiente...")
-            
-            await page.wait_for_timeout(10000) 
-            
-            print("... simulando scroll para cargar productos...")
-            await page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
-            await page.wait_for_timeout(5000)
+    if rows:
+        print(f"⚡ API del catálogo respondió con {len(rows)} productos: {url}")
+        return rows
 
-            print("... esperando selector de productos...")
-            await page.wait_for_selector(PRODUCT_CARD_SELECTOR, timeout=60000)
-            print("📦 Productos encontrados en la página.")
+    try:
+        response = await client.get(url)
+        if response.status_code == 200:
+            rows = parse_html_products(response.text, config)
+    except httpx.HTTPError as e:
+        print(f"⚠️ Error descargando el HTML de la categoría ({url}): {e}")
 
-        except TimeoutError:
-            print("❌ Error: Timeout final esperando los productos. El bloqueo es persistente.")
-            screenshot_path = "debug_screenshot.png"
-            await page.screenshot(path=screenshot_path, full_page=True)
-            print(f"📸 Screenshot '{screenshot_path}' guardado para depuración.")
-            await browser.close()
-            return
-        except Exception as e:
-            print(f"❌ Error al navegar a la página: {e}")
-            await browser.close()
-            return
+    if rows:
+        print(f"⚡ HTML de la categoría entregó {len(rows)} productos: {url}")
+    else:
+        print(f"... ni la API ni el HTML de la categoría entregaron productos: {url}")
+    return rows
 
-        product_elements = await page.query_selector_all(PRODUCT_CARD_SELECTOR)
-        
-        print(f"🔎 Encontrados {len(product_elements)} productos. Extrayendo datos...")
-        
-        try:
-            supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-            response = supabase.table("supermarkets").select("id").eq("slug", SUPERMARKET_SLUG).execute()
-            supermarket_id = response.data[0]['id']
-            print(f"✅ Conexión a Supabase y ID de supermercado ('{supermarket_id}') obtenidos.")
-        except Exception as e:
-            print(f"❌ Error conectando a Supabase o obteniendo ID: {e}")
-            await browser.close()
-            return
+async def fetch_via_api(config):
+    """
+    Recorre todas las categorías por HTTP con un único cliente compartido.
+    Devuelve un dict {url: filas}; las categorías que fallan quedan vacías
+    para que scrape() las recorra con el navegador.
+    """
+    proxy = get_proxy_url() if config.use_proxy else None
+    headers = {"User-Agent": config.user_agent, "Accept": "application/json, text/html;q=0.9"}
+    semaphore = asyncio.Semaphore(config.max_concurrency)
 
-        products_to_insert = []
-        for element in product_elements:
+    async def bounded(client, url):
+        async with semaphore:
             try:
-                name_element = await element.query_selector(PRODUCT_NAME_SELECTOR)
-                price_element = await element.query_selector(PRODUCT_PRICE_SELECTOR)
-                
-                if name_element and price_element:
-                    name = await name_element.inner_text()
-                    price_text = await price_element.inner_text()
-                    price = int(''.join(filter(str.isdigit, price_text)))
-
-                    if price > 0:
-                        products_to_insert.append({
-                            "supermarket_id": supermarket_id,
-                            "price": price, "regular_price": price, "is_available": True,
-                            "source": "scraping", "metadata": { "scraped_name": name.strip() } 
-                        })
+                return await fetch_category(client, config, url)
             except Exception as e:
-                print(f"⚠️ Error extrayendo un producto: {e}. Continuando.")
+                print(f"⚠️ Error en el camino rápido ({url}): {e}")
+                return []
 
-        await browser.close()
-        
-        if products_to_insert:
-            print(f"📥 Insertando {len(products_to_insert)} productos en la base de datos...")
-            try:
-                response = supabase.table("prices").insert(products_to_insert).execute()
-                if response.data:
-                    print(f"✅ ¡Éxito! {len(response.data)} registros insertados.")
-                else:
-                    print(f"❌ Error en la inserción: {getattr(response, 'error', 'Error desconocido')}")
-            except Exception as e:
-                print(f"❌ Error crítico al insertar en Supabase: {e}")
-        else:
-            print("🤷 No se encontraron productos válidos para insertar.")
+    try:
+        async with httpx.AsyncClient(http2=True, headers=headers, proxy=proxy, timeout=30, follow_redirects=True) as client:
+            results = await asyncio.gather(*(bounded(client, url) for url in config.target_urls))
+    except Exception as e:
+        # Ej.: httpx.InvalidURL por un PROXY_PORT mal escrito. Seguimos con el navegador.
+        print(f"⚠️ No se pudo crear el cliente HTTP: {e}. Usando el navegador.")
+        return {}
+    return dict(zip(config.target_urls, results))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(scrape(config_from_env(CONFIG), fast_path=fetch_via_api))